@@ -1,62 +1,190 @@
+import asyncio
+import itertools
+import logging
 import os
-import json
-import random
+import re
+import sqlite3
+import threading
+import time
 from datetime import datetime
 from typing import TypedDict, Annotated, List
 from dotenv import load_dotenv
 import httpx
+import orjson
 
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.aiosqlite import AsyncSqliteSaver
 from langchain_core.tools import tool
 
 from app.tools import tool_check_availability, tool_book_slot, tool_list_events
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Load keys and parse into list
 OPENROUTER_API_KEYS = os.getenv("OPENROUTER_API_KEY", "")
-print("ENV RAW:", os.getenv("OPENROUTER_API_KEY"))
 
 API_KEYS_LIST = [key.strip() for key in OPENROUTER_API_KEYS.split(",") if key.strip()]
-print("API List",API_KEYS_LIST)
+logger.debug("Loaded %d OpenRouter API key(s)", len(API_KEYS_LIST))
+
+# Rotate keys round-robin instead of picking at random: fairer quota usage
+# across keys and no rng call per request.
+_KEY_ITER = itertools.cycle(API_KEYS_LIST)
+_KEY_LOCK = threading.Lock()
+
+# Keys that answered 429/401 sit out for a cooldown instead of being retried
+# against the full request timeout.
+_KEY_COOLDOWN = 60  # seconds
+_KEY_STATUS = {}  # key -> unix timestamp it becomes usable again
+
+def _next_key() -> str:
+    now = time.time()
+    with _KEY_LOCK:
+        for _ in range(len(API_KEYS_LIST)):
+            key = next(_KEY_ITER)
+            if _KEY_STATUS.get(key, 0) <= now:
+                return key
+        # Every key is cooling down — fall back to the one that recovers first
+        return min(API_KEYS_LIST, key=lambda k: _KEY_STATUS.get(k, 0))
+
+def _demote_key(key: str) -> None:
+    with _KEY_LOCK:
+        _KEY_STATUS[key] = time.time() + _KEY_COOLDOWN
 
 OPENROUTER_MODEL = "deepseek/deepseek-chat-v3-0324:free"
 
+# Only the most recent turns are sent to the model; without a cap the payload
+# (and the tokens billed/parsed) grows with every turn of the session.
+MAX_TURNS = 12
+
+# Clarification markers in the assistant reply; one case-insensitive scan
+# instead of lowercasing the whole message and doing four substring searches.
+_CLARIFY_RE = re.compile(r"specify|unclear|missing|duration", re.IGNORECASE)
+
+# Shared async client: keeps the TCP/TLS connection to openrouter.ai alive
+# across requests instead of handshaking on every call.
+REQUEST_TIMEOUT = httpx.Timeout(30.0, connect=10.0, read=30.0, write=10.0, pool=5.0)
+ASYNC_CLIENT = httpx.AsyncClient(
+    timeout=REQUEST_TIMEOUT,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+
+def append_messages(left: List[dict], right: List[dict]) -> List[dict]:
+    """Reducer for the messages channel: nodes emit only their new messages.
+
+    A plain list-concat reducer (rather than langgraph's add_messages) keeps
+    the OpenAI-style dicts we send to OpenRouter as-is instead of coercing
+    them to BaseMessage objects.
+    """
+    return left + right
+
 class TailorTalkState(TypedDict):
-    messages: Annotated[List[dict], "Conversation messages"]
+    messages: Annotated[List[dict], append_messages]
     user_id: str
     pending_clarification: bool
     tool_calls_made: List[str]
     session_context: dict
+    _next: str
+
+async def _post_openrouter(data):
+    # One attempt per configured key: a dead key is demoted and the next
+    # one tried instead of surfacing a user-visible error straight away.
+    for _ in range(max(1, len(API_KEYS_LIST))):
+        selected_key = _next_key()
+        logger.debug("selected_key=...%s", selected_key[-4:])
+        headers = {
+            "Authorization": f"Bearer {selected_key}",
+            "HTTP-Referer": "https://yourapp.com",
+            "X-Title": "TailorTalk"
+        }
 
-def call_openrouter(messages, model=OPENROUTER_MODEL, temperature=0.3):
-    # Randomly select an API key
+        try:
+            response = await ASYNC_CLIENT.post("https://openrouter.ai/api/v1/chat/completions", json=data, headers=headers)
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (429, 401):
+                _demote_key(selected_key)
+                continue
+            raise
+        except httpx.RequestError as e:
+            return "Sorry, there was a delay processing your request. Please try again."
+
+    return "All API keys are currently rate-limited. Please try again in a minute."
+
+# Coalesce bursts of LLM calls: requests landing within MAX_WAIT of each other
+# are dispatched together over the shared connection pool, amortizing per-burst
+# overhead and smoothing RPM pressure on rate-limited keys.
+MAX_BATCH = 8
+MAX_WAIT = 0.075  # seconds
+
+_llm_queue = None
+_llm_batch_task = None
+# Strong references to in-flight dispatch tasks; the event loop only keeps
+# weak ones, so a batch could otherwise be garbage-collected mid-flight.
+_llm_dispatch_tasks = set()
+
+async def _dispatch_batch(batch):
+    replies = await asyncio.gather(
+        *[_post_openrouter(data) for data, _ in batch],
+        return_exceptions=True
+    )
+    for (_, future), reply in zip(batch, replies):
+        # The caller may have been cancelled while the batch was in
+        # flight (uvicorn cancels handler tasks on client disconnect);
+        # resolving a cancelled future raises InvalidStateError and
+        # would kill the worker.
+        if future.done():
+            continue
+        if isinstance(reply, BaseException):
+            future.set_exception(reply)
+        else:
+            future.set_result(reply)
+
+async def _llm_batch_worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _llm_queue.get()]
+        deadline = loop.time() + MAX_WAIT
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_llm_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Dispatch in its own task and go straight back to collecting:
+        # awaiting the gather here would make every request that arrives
+        # mid-flight wait for the whole previous batch to finish.
+        task = asyncio.create_task(_dispatch_batch(batch))
+        _llm_dispatch_tasks.add(task)
+        task.add_done_callback(_llm_dispatch_tasks.discard)
+
+async def call_openrouter(messages, model=OPENROUTER_MODEL, temperature=0.3):
+    global _llm_queue, _llm_batch_task
     if not API_KEYS_LIST:
         return "No API keys available. Please check configuration."
 
-    selected_key = random.choice(API_KEYS_LIST)
-    print(selected_key)
-    headers = {
-        "Authorization": f"Bearer {selected_key}",
-        "HTTP-Referer": "https://yourapp.com",
-        "X-Title": "TailorTalk"
-    }
-
     data = {
         "model": model,
         "messages": messages,
         "temperature": temperature
     }
 
-    timeout = httpx.Timeout(30.0, connect=10.0, read=30.0, write=10.0, pool=5.0)
+    # The queue and worker are created lazily so they bind to the running
+    # loop; a worker that died is restarted rather than left for dead with
+    # callers blocked on their futures forever.
+    if _llm_queue is None:
+        _llm_queue = asyncio.Queue()
+    if _llm_batch_task is None or _llm_batch_task.done():
+        _llm_batch_task = asyncio.create_task(_llm_batch_worker())
 
-    try:
-        with httpx.Client(timeout=timeout) as client:
-            response = client.post("https://openrouter.ai/api/v1/chat/completions", json=data, headers=headers)
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
-    except httpx.RequestError as e:
-        return "Sorry, there was a delay processing your request. Please try again."
+    future = asyncio.get_running_loop().create_future()
+    await _llm_queue.put((data, future))
+    return await future
 
 
 @tool
@@ -76,9 +204,8 @@ def list_events(start_date: str = None, end_date: str = None) -> list:
 
 tools = [check_availability, book_slot, list_events]
 
-def build_system_prompt() -> str:
-    now = datetime.now().strftime("%Y-%m-%d %H:%M")
-    return f"""
+# Static prompt template, built once at import; only {now} changes per minute.
+_PROMPT_TEMPLATE = """
 You are TailorTalk, a friendly, precise AI assistant managing a shared Google Calendar. You DO have full access to the user's calendar and can perform real-time operations using tool calls.
 
 🕒 Always remember: Current date and time: {now}.
@@ -128,6 +255,15 @@ Reply: Please specify a duration is the event for 1 hour, 2 hours or some other
   }}
 }}
 
+✅ If the user asks for several things at once, batch them in ONE reply:
+
+{{
+  "tool_calls": [
+    {{"tool_call": "check_availability", "arguments": {{"start_date": "2025-06-25", "end_date": "2025-06-25"}}}},
+    {{"tool_call": "list_events", "arguments": {{"start_date": "2025-06-25", "end_date": "2025-06-30"}}}}
+  ]
+}}
+
 ---
 
 🧠 Time Parsing & Resolution:
@@ -188,111 +324,152 @@ User: "Schedule a meeting with John."
 ⚡ Begin now.
 """
 
-def user_input_node(state: TailorTalkState) -> TailorTalkState:
+# (minute key, rendered prompt) — the timestamp only changes once per minute,
+# so concurrent requests within the same minute share one string.
+_prompt_cache = ("", "")
+
+def build_system_prompt() -> str:
+    global _prompt_cache
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    if now == _prompt_cache[0]:
+        return _prompt_cache[1]
+    prompt = _PROMPT_TEMPLATE.format(now=now)
+    _prompt_cache = (now, prompt)
+    return prompt
+
+def user_input_node(state: TailorTalkState) -> dict:
     # print("[DEBUG] user_input_node:", state)
-    return state
+    return {}
 
-def llm_node(state: TailorTalkState) -> TailorTalkState:
-    messages = [{"role": "system", "content": build_system_prompt()}] + state["messages"]
-    response_content = call_openrouter(messages)
-    state["messages"].append({"role": "assistant", "content": response_content})
-    state["pending_clarification"] = False
+async def llm_node(state: TailorTalkState) -> dict:
+    messages = [{"role": "system", "content": build_system_prompt()}] + state["messages"][-MAX_TURNS:]
+    response_content = await call_openrouter(messages)
     # print("[DEBUG] llm_node:", state)
-    return state
+    return {
+        "messages": [{"role": "assistant", "content": response_content}],
+        "pending_clarification": False
+    }
 
 def router_node(state: TailorTalkState) -> dict:
     last_content = state["messages"][-1]["content"]
     # print("[DEBUG] router_node:", last_content)
 
+    decision = "output"
     try:
-        parsed = json.loads(last_content)
-        if isinstance(parsed, dict) and "tool_call" in parsed and "arguments" in parsed:
-            return {"next": "tool_execution"}
-    except json.JSONDecodeError:
+        parsed = orjson.loads(last_content)
+        if isinstance(parsed, dict) and (
+            ("tool_call" in parsed and "arguments" in parsed) or "tool_calls" in parsed
+        ):
+            decision = "tool_execution"
+    except orjson.JSONDecodeError:
         pass
 
-    if any(keyword in last_content.lower() for keyword in ["specify", "unclear", "missing", "duration"]):
-        return {"next": "clarification"}
-    return {"next": "output"}
+    if decision == "output" and _CLARIFY_RE.search(last_content):
+        decision = "clarification"
 
-def clarification_node(state: TailorTalkState) -> TailorTalkState:
-    # print("[DEBUG] clarification_node:", state)
-    state["pending_clarification"] = True
-    return state
+    return {"_next": decision}
 
-def tool_execution_node(state: TailorTalkState) -> TailorTalkState:
+def clarification_node(state: TailorTalkState) -> dict:
+    # print("[DEBUG] clarification_node:", state)
+    return {"pending_clarification": True}
+
+def _format_events(raw_result) -> str:
+    if raw_result and isinstance(raw_result, list):
+        lines = ["📋 **Upcoming Events:**"]
+        app = lines.append  # cache the method lookup for the loop
+        for event in raw_result:
+            app(
+                f"• **{event.get('summary', 'No Title')}** - {event.get('date', '')} {event.get('time', '')}"
+                + (f"\n  📝 {desc}" if (desc := event.get("description")) else "")
+                + (f"\n  🔗 [Open in Calendar]({link})" if (link := event.get("link")) else "")
+            )
+
+        return "\n".join(lines)
+    return "📭 No upcoming events found in your calendar."
+
+# Dispatch straight to the plain tool functions: the arguments come from our
+# own JSON schema, so LangChain's per-call .invoke() validation adds nothing.
+TOOL_DISPATCH = {
+    "check_availability": tool_check_availability,
+    "book_slot": tool_book_slot,
+    "list_events": tool_list_events
+}
+
+async def _dispatch_tool(tool_call: str, arguments: dict) -> str:
+    # googleapiclient is sync, so each tool runs in a worker thread;
+    # asyncio.gather over these makes batched calls cost max() not sum().
+    fn = TOOL_DISPATCH.get(tool_call)
+    if fn is None:
+        return f"⚠️ Unknown tool call: `{tool_call}`"
+    result = await asyncio.to_thread(fn, **arguments)
+    if tool_call == "list_events":
+        return _format_events(result)
+    return result
+
+# Tools whose output is already user-ready: list_events is formatted markdown
+# and book_slot returns its own ✅ / ⚠️ Overlap message. Only check_availability
+# benefits from an LLM pass to summarize the raw busy slots.
+TERMINAL_TOOLS = {"list_events", "book_slot"}
+
+async def tool_execution_node(state: TailorTalkState) -> dict:
     last_content = state["messages"][-1]["content"]
     tools_used, results = [], []
 
     try:
-        parsed = json.loads(last_content)
-        tool_call = parsed.get("tool_call")
-        arguments = parsed.get("arguments", {})
-
-        if tool_call == "check_availability":
-            result = check_availability.invoke(arguments)
-            tools_used.append("check_availability")
-            results.append(result)
-
-        elif tool_call == "book_slot":
-            result = book_slot.invoke(arguments)
-            tools_used.append("book_slot")
-            results.append(result)
-
-        elif tool_call == "list_events":
-            raw_result = list_events.invoke(arguments)
-            tools_used.append("list_events")
-
-            if raw_result and isinstance(raw_result, list):
-                lines = ["📋 **Upcoming Events:**"]
-                for event in raw_result:
-                    summary = event.get("summary", "No Title")
-                    date_str = event.get("date", "")
-                    time_str = event.get("time", "")
-                    description = event.get("description", "")
-                    link = event.get("link", "")
-
-                    desc_text = f"\n  📝 {description}" if description else ""
-                    link_text = f"\n  🔗 [Open in Calendar]({link})" if link else ""
-
-                    lines.append(f"• **{summary}** - {date_str} {time_str}{desc_text}{link_text}")
-
-                response_text = "\n".join(lines)
-                results.append(response_text)
-            else:
-                results.append("📭 No upcoming events found in your calendar.")
-
+        parsed = orjson.loads(last_content)
+
+        # Either a single {"tool_call": ..., "arguments": ...} object or a
+        # batched {"tool_calls": [...]} list.
+        if "tool_calls" in parsed:
+            calls = [
+                (tc.get("tool_call"), tc.get("arguments", {}))
+                for tc in parsed["tool_calls"]
+            ]
         else:
-            results.append(f"⚠️ Unknown tool call: `{tool_call}`")
+            calls = [(parsed.get("tool_call"), parsed.get("arguments", {}))]
+
+        results = list(await asyncio.gather(
+            *[_dispatch_tool(name, args) for name, args in calls]
+        ))
+        tools_used = [name for name, _ in calls if name in TOOL_DISPATCH]
 
     except Exception as e:
         results.append(f"❌ Tool execution error: {str(e)}")
 
-    # Append user-visible summary to messages
-    state["messages"].append({
-        "role": "user",
-        "content": "\n".join(results)
-    })
-
-    # Continue conversation with LLM
-    follow_up = call_openrouter(
-        [{"role": "system", "content": build_system_prompt()}] + state["messages"]
-    )
-    state["messages"].append({"role": "assistant", "content": follow_up})
-    state["tool_calls_made"] += tools_used
+    if tools_used and all(name in TERMINAL_TOOLS for name in tools_used):
+        # Result is already the answer — skip the follow-up LLM round-trip
+        new_messages = [{
+            "role": "assistant",
+            "content": "\n".join(results)
+        }]
+    else:
+        # Append user-visible summary to messages
+        new_messages = [{
+            "role": "user",
+            "content": "\n".join(results)
+        }]
+
+        # Continue conversation with LLM
+        follow_up = await call_openrouter(
+            [{"role": "system", "content": build_system_prompt()}]
+            + (state["messages"] + new_messages)[-MAX_TURNS:]
+        )
+        new_messages.append({"role": "assistant", "content": follow_up})
 
     # Debug:
     # print("[DEBUG] tool_execution_node updated state:", state)
 
-    return state
+    return {
+        "messages": new_messages,
+        "tool_calls_made": state["tool_calls_made"] + tools_used
+    }
 
 
 
-def output_node(state: TailorTalkState) -> TailorTalkState:
-    print("[DEBUG] output_node:", state)
-    return state
+def output_node(state: TailorTalkState) -> dict:
+    return {}
 
-def create_tailortalk_graph():
+def create_tailortalk_graph(checkpointer=None):
     graph = StateGraph(TailorTalkState)
     graph.add_node("user_input", user_input_node)
     graph.add_node("llm", llm_node)
@@ -305,7 +482,7 @@ def create_tailortalk_graph():
     graph.add_edge("llm", "router")
     graph.add_conditional_edges(
         "router",
-        lambda state: router_node(state)["next"],
+        lambda state: state["_next"],
         {
             "tool_execution": "tool_execution",
             "clarification": "clarification",
@@ -316,27 +493,100 @@ def create_tailortalk_graph():
     graph.add_edge("clarification", "output")
     graph.add_edge("output", END)
     graph.set_entry_point("user_input")
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+# Sessions are persisted through LangGraph's sqlite checkpointer, keyed by
+# thread_id=user_id. Unlike a process-local dict this is bounded by disk, not
+# RAM, and survives restarts / works across uvicorn workers.
+SESSIONS_DB = os.getenv("TAILORTALK_SESSIONS_DB", "sessions.db")
+
+# The graph is driven through ainvoke, and on this langgraph version the plain
+# SqliteSaver only implements the sync checkpoint methods — Pregel's
+# `await checkpointer.aget_tuple(...)` would hit the base class's
+# NotImplementedError on every request. The aiosqlite-backed saver implements
+# the async side.
+checkpoint_saver = AsyncSqliteSaver.from_conn_string(SESSIONS_DB)
+
+# The session admin helpers below are called from sync endpoints, so they go
+# through their own plain sqlite3 connection to the same database file instead
+# of the saver's aiosqlite connection.
+_admin_conn = sqlite3.connect(SESSIONS_DB, check_same_thread=False)
+_SAVER_LOCK = threading.Lock()
+
+# Compile the graph once at import time; it is stateless per-user, so the
+# compiled Runnable can be shared across all requests.
+COMPILED_GRAPH = create_tailortalk_graph(checkpointer=checkpoint_saver)
+
+def _thread_config(user_id: str) -> dict:
+    return {"configurable": {"thread_id": user_id}}
+
+async def get_session_state(user_id: str) -> dict:
+    """Return the checkpointed graph state for a user (empty dict if none)."""
+    try:
+        snapshot = await COMPILED_GRAPH.aget_state(_thread_config(user_id))
+        return dict(snapshot.values) if snapshot and snapshot.values else {}
+    except Exception:
+        return {}
 
-conversation_sessions = {}
+def active_session_ids() -> list:
+    """List user ids that have a checkpointed session."""
+    try:
+        with _SAVER_LOCK:
+            rows = _admin_conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints"
+            ).fetchall()
+        return [row[0] for row in rows]
+    except Exception:
+        # Table is created lazily on first checkpoint
+        return []
+
+def clear_session(user_id: str) -> None:
+    """Drop all checkpoints for a user."""
+    try:
+        with _SAVER_LOCK:
+            _admin_conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (user_id,)
+            )
+            _admin_conn.commit()
+    except Exception:
+        pass
+
+def clear_sessions() -> None:
+    """Drop all checkpointed sessions."""
+    try:
+        with _SAVER_LOCK:
+            _admin_conn.execute("DELETE FROM checkpoints")
+            _admin_conn.commit()
+    except Exception:
+        pass
+
+async def close_checkpointer() -> None:
+    """Close the saver's aiosqlite connection on shutdown.
 
-def get_agent_response(message: str, user_id: str = "default") -> str:
+    Its worker thread is non-daemon, so leaving it open blocks interpreter
+    exit once the first checkpoint has been written.
+    """
     try:
-        if user_id not in conversation_sessions:
-            conversation_sessions[user_id] = {
-                "messages": [],
-                "user_id": user_id,
-                "pending_clarification": False,
-                "tool_calls_made": [],
-                "session_context": {}
-            }
-
-        state = conversation_sessions[user_id]
-        state["messages"].append({"role": "user", "content": message})
-
-        graph = create_tailortalk_graph()
-        result = graph.invoke(state)
-        conversation_sessions[user_id] = result
+        await checkpoint_saver.conn.close()
+    except Exception:
+        pass
+
+async def get_agent_response(message: str, user_id: str = "default") -> str:
+    try:
+        config = _thread_config(user_id)
+        previous = await get_session_state(user_id)
+
+        # Only the new user message crosses into the graph; the
+        # append_messages reducer merges it with the checkpointed history.
+        state = {
+            "messages": [{"role": "user", "content": message}],
+            "user_id": user_id,
+            "pending_clarification": False,
+            "tool_calls_made": previous.get("tool_calls_made", []),
+            "session_context": previous.get("session_context", {})
+        }
+
+        result = await COMPILED_GRAPH.ainvoke(state, config=config)
 
         last_msg = result["messages"][-1]
         return last_msg["content"] if last_msg["role"] == "assistant" else "Sorry, could not process the request."
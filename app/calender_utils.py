@@ -2,10 +2,10 @@ from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 import os
+import threading
 from dotenv import load_dotenv
 from dateutil import tz
 import logging
-from dateutil.parser import parse
 
 load_dotenv()
 
@@ -14,6 +14,10 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
+
+# Resolved once at import; tz.gettz hits the zoneinfo database on every call
+IST = tz.gettz('Asia/Kolkata')
+UTC = tz.UTC
 TAILORTALK_CALENDAR_ID = os.getenv("TAILORTALK_CALENDAR_ID")  # <-- use shared calendar
 
 def get_credentials():
@@ -37,17 +41,36 @@ def get_credentials():
             
         return creds
     except Exception as e:
-        logger.error(f"Error creating credentials: {str(e)}")
+        logger.error("Error creating credentials: %s", e)
         raise
 
+# Cached service handle: rebuilding credentials and fetching the discovery
+# document on every tool call costs tens of ms of pure overhead.
+_service = None
+_service_lock = threading.Lock()
+
 def get_calendar_service():
-    """Get Google Calendar service"""
+    """Get Google Calendar service (built once, then reused)"""
+    global _service
     try:
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
-        return service
+        with _service_lock:
+            if _service is None:
+                creds = get_credentials()
+                _service = build(
+                    "calendar", "v3",
+                    credentials=creds,
+                    cache_discovery=False,
+                    static_discovery=True
+                )
+            else:
+                # Refresh the existing credentials in place instead of
+                # rebuilding the whole service
+                creds = _service._http.credentials
+                if creds and creds.expired and creds.refresh_token:
+                    creds.refresh(Request())
+        return _service
     except Exception as e:
-        logger.error(f"Error creating calendar service: {str(e)}")
+        logger.error("Error creating calendar service: %s", e)
         raise
 
 def get_free_slots(start_time, end_time):
@@ -57,17 +80,17 @@ def get_free_slots(start_time, end_time):
         
         # Convert to UTC if needed
         if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=tz.gettz('Asia/Kolkata'))
+            start_time = start_time.replace(tzinfo=IST)
         if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=tz.gettz('Asia/Kolkata'))
+            end_time = end_time.replace(tzinfo=IST)
             
         body = {
-            "timeMin": start_time.astimezone(tz.UTC).isoformat().replace('+00:00', 'Z'),
-            "timeMax": end_time.astimezone(tz.UTC).isoformat().replace('+00:00', 'Z'),
+            "timeMin": start_time.astimezone(UTC).isoformat().replace('+00:00', 'Z'),
+            "timeMax": end_time.astimezone(UTC).isoformat().replace('+00:00', 'Z'),
             "items": [{"id": TAILORTALK_CALENDAR_ID}]
         }
         
-        logger.info(f"Checking availability from {start_time} to {end_time}")
+        logger.info("Checking availability from %s to %s", start_time, end_time)
         events = service.freebusy().query(body=body).execute()
         busy_times = events["calendars"][TAILORTALK_CALENDAR_ID].get("busy", [])
         
@@ -78,8 +101,8 @@ def get_free_slots(start_time, end_time):
             end_dt = datetime.fromisoformat(busy_slot['end'].replace('Z', '+00:00'))
             
             # Convert to local time
-            local_start = start_dt.astimezone(tz.gettz('Asia/Kolkata'))
-            local_end = end_dt.astimezone(tz.gettz('Asia/Kolkata'))
+            local_start = start_dt.astimezone(IST)
+            local_end = end_dt.astimezone(IST)
             
             formatted_busy.append({
                 'start': local_start.strftime('%Y-%m-%d %H:%M'),
@@ -89,7 +112,7 @@ def get_free_slots(start_time, end_time):
         return formatted_busy
         
     except Exception as e:
-        logger.error(f"Error checking availability: {str(e)}")
+        logger.error("Error checking availability: %s", e)
         return f"Error checking availability: {str(e)}"
 
 def book_event(summary=None, start_time=None, end_time=None, description=None):
@@ -103,15 +126,15 @@ def book_event(summary=None, start_time=None, end_time=None, description=None):
 
         # Ensure timezone info
         if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=tz.gettz('Asia/Kolkata'))
+            start_time = start_time.replace(tzinfo=IST)
         if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=tz.gettz('Asia/Kolkata'))
+            end_time = end_time.replace(tzinfo=IST)
 
         # Check for overlap
-        time_min = start_time.astimezone(tz.UTC).isoformat().replace('+00:00', 'Z')
-        time_max = end_time.astimezone(tz.UTC).isoformat().replace('+00:00', 'Z')
+        time_min = start_time.astimezone(UTC).isoformat().replace('+00:00', 'Z')
+        time_max = end_time.astimezone(UTC).isoformat().replace('+00:00', 'Z')
 
-        logger.info(f"Checking for overlaps: {time_min} to {time_max}")
+        logger.info("Checking for overlaps: %s to %s", time_min, time_max)
         
         overlapping_events = service.events().list(
             calendarId=TAILORTALK_CALENDAR_ID,
@@ -141,7 +164,7 @@ def book_event(summary=None, start_time=None, end_time=None, description=None):
             }
         }
 
-        logger.info(f"Creating event: {summary} at {start_time}")
+        logger.info("Creating event: %s at %s", summary, start_time)
         created_event = service.events().insert(
             calendarId=TAILORTALK_CALENDAR_ID,
             body=event
@@ -150,7 +173,7 @@ def book_event(summary=None, start_time=None, end_time=None, description=None):
         return f"✅ Meeting '{summary}' booked from {start_time.strftime('%H:%M')} to {end_time.strftime('%H:%M')} on {start_time.strftime('%Y-%m-%d')}.\n📎 Event Link: {created_event.get('htmlLink')}"
         
     except Exception as e:
-        logger.error(f"Error booking event: {str(e)}")
+        logger.error("Error booking event: %s", e)
         return f"Error booking event: {str(e)}"
 
 from datetime import datetime
@@ -163,21 +186,21 @@ def list_upcoming_events(start=None, end=None):
     """List upcoming events from the shared calendar, including start and end time"""
     try:
         service = get_calendar_service()
-        now = datetime.now(tz.gettz('Asia/Kolkata'))
+        now = datetime.now(IST)
 
         # Use current time if no start specified
         if start is None:
             start = now
         elif start.tzinfo is None:
-            start = start.replace(tzinfo=tz.gettz('Asia/Kolkata'))
+            start = start.replace(tzinfo=IST)
 
-        time_min = start.astimezone(tz.UTC).isoformat().replace('+00:00', 'Z')
+        time_min = start.astimezone(UTC).isoformat().replace('+00:00', 'Z')
         time_max = None
 
         if end:
             if end.tzinfo is None:
-                end = end.replace(tzinfo=tz.gettz('Asia/Kolkata'))
-            time_max = end.astimezone(tz.UTC).isoformat().replace('+00:00', 'Z')
+                end = end.replace(tzinfo=IST)
+            time_max = end.astimezone(UTC).isoformat().replace('+00:00', 'Z')
 
         query = {
             'timeMin': time_min,
@@ -188,7 +211,7 @@ def list_upcoming_events(start=None, end=None):
         if time_max:
             query['timeMax'] = time_max
 
-        logger.info(f"Listing events from {time_min} to {time_max or 'end of time'}")
+        logger.info("Listing events from %s to %s", time_min, time_max or 'end of time')
 
         events_result = service.events().list(
             calendarId=TAILORTALK_CALENDAR_ID,
@@ -197,23 +220,33 @@ def list_upcoming_events(start=None, end=None):
 
         events = events_result.get('items', [])
 
-        # Format each event with both start and end times
+        # Format each event with both start and end times. Hot names are
+        # bound to locals before the loop: LOAD_FAST is much cheaper than
+        # the global/attribute lookups it replaces, and this loop scales
+        # with maxResults.
         formatted_events = []
+        app = formatted_events.append
+        _from_iso = datetime.fromisoformat
+        _ist = IST
+        _fmt_hm = '%H:%M'
+        _fmt_ymd = '%Y-%m-%d'
         for event in events:
             start_str = event['start'].get('dateTime', event['start'].get('date'))
             end_str = event['end'].get('dateTime', event['end'].get('date'))
 
-            # Parse and format both start and end
+            # Parse and format both start and end; Google always returns
+            # RFC3339, so fromisoformat is enough (and much faster than
+            # dateutil's general-purpose parser)
             if 'T' in start_str:
-                start_dt = parse(start_str).astimezone(tz.gettz('Asia/Kolkata'))
-                end_dt = parse(end_str).astimezone(tz.gettz('Asia/Kolkata'))
-                time_range = f"{start_dt.strftime('%H:%M')} – {end_dt.strftime('%H:%M')}"
-                date_display = start_dt.strftime('%Y-%m-%d')
+                start_dt = _from_iso(start_str.replace('Z', '+00:00')).astimezone(_ist)
+                end_dt = _from_iso(end_str.replace('Z', '+00:00')).astimezone(_ist)
+                time_range = f"{start_dt.strftime(_fmt_hm)} – {end_dt.strftime(_fmt_hm)}"
+                date_display = start_dt.strftime(_fmt_ymd)
             else:
                 time_range = "All-day"
                 date_display = start_str
 
-            formatted_events.append({
+            app({
                 'summary': event.get('summary', 'No Title'),
                 'date': date_display,
                 'time': time_range,
@@ -224,7 +257,7 @@ def list_upcoming_events(start=None, end=None):
         return formatted_events
 
     except Exception as e:
-        logger.error(f"Error listing events: {str(e)}")
+        logger.error("Error listing events: %s", e)
         return f"Error listing events: {str(e)}"
 
 # Add missing import for Request
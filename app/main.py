@@ -1,8 +1,16 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from agent.message_graph import get_agent_response, conversation_sessions
-from app.memory import update_state, get_state, get_all_states, clear_state
+from agent.message_graph import (
+    get_agent_response,
+    get_session_state,
+    active_session_ids,
+    clear_session,
+    clear_sessions,
+    close_checkpointer,
+)
+from app.memory import update_state_bulk, get_state, get_all_states, clear_state
 import uuid
 import logging
 from typing import Optional
@@ -18,7 +26,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="TailorTalk API", 
     version="1.0.0",
-    description="AI-powered calendar assistant using LangGraph and OpenRouter"
+    description="AI-powered calendar assistant using LangGraph and OpenRouter",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -70,24 +79,27 @@ async def chat_endpoint(input: ChatInput):
         user_id = input.user_id or str(uuid.uuid4())
         
         # Log the incoming request
-        logger.info(f"Chat request from user {user_id[:8]}...: {input.message[:100]}...")
+        logger.info("Chat request from user %s...: %s...", user_id[:8], input.message[:100])
         
         # Update conversation state in memory module
         user_state = get_state(user_id)
         message_count = user_state.get('message_count', 0) + 1
-        update_state(user_id, 'message_count', message_count)
-        update_state(user_id, 'last_message', input.message)
-        update_state(user_id, 'last_interaction', datetime.now().isoformat())
+        update_state_bulk(
+            user_id,
+            message_count=message_count,
+            last_message=input.message,
+            last_interaction=datetime.now().isoformat()
+        )
         
         # Get agent response using LangGraph
-        response = get_agent_response(input.message, user_id)
+        response = await get_agent_response(input.message, user_id)
         
-        # Get session info from LangGraph state
-        session_state = conversation_sessions.get(user_id, {})
+        # Get session info from the checkpointed LangGraph state
+        session_state = await get_session_state(user_id)
         tool_calls_made = session_state.get('tool_calls_made', [])
         
         # Log the response
-        logger.info(f"Response to user {user_id[:8]}...: {response[:100]}...")
+        logger.info("Response to user %s...: %s...", user_id[:8], response[:100])
         
         return ChatResponse(
             response=response,
@@ -100,7 +112,7 @@ async def chat_endpoint(input: ChatInput):
         )
     
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in chat endpoint: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500, 
             detail=f"Internal server error: {str(e)}"
@@ -113,7 +125,7 @@ def health_check():
         status="healthy",
         timestamp=datetime.now().isoformat(),
         version="1.0.0",
-        active_sessions=len(conversation_sessions)
+        active_sessions=len(active_session_ids())
     )
 
 @app.get("/test-calendar")
@@ -129,7 +141,7 @@ def test_calendar():
             "calendar_test": result
         }
     except Exception as e:
-        logger.error(f"Calendar test failed: {str(e)}")
+        logger.error("Calendar test failed: %s", e)
         return {
             "status": "error",
             "message": "Calendar connection failed",
@@ -137,18 +149,18 @@ def test_calendar():
         }
 
 @app.get("/test-llm")
-def test_llm():
+async def test_llm():
     """Test endpoint to check OpenRouter/LLM connectivity"""
     try:
         logger.info("Testing LLM connectivity...")
-        result = get_agent_response("Hello, this is a connectivity test", "test_user")
+        result = await get_agent_response("Hello, this is a connectivity test", "test_user")
         return {
             "status": "success",
             "message": "LLM connection successful",
             "llm_test": result
         }
     except Exception as e:
-        logger.error(f"LLM test failed: {str(e)}")
+        logger.error("LLM test failed: %s", e)
         return {
             "status": "error",
             "message": "LLM connection failed",
@@ -160,7 +172,7 @@ def get_sessions():
     """Get information about active sessions"""
     try:
         memory_states = get_all_states()
-        langgraph_sessions = len(conversation_sessions)
+        langgraph_session_ids = set(active_session_ids())
         
         session_info = {}
         for user_id, state in memory_states.items():
@@ -168,17 +180,17 @@ def get_sessions():
                 "message_count": state.get('message_count', 0),
                 "last_interaction": state.get('last_interaction', 'Unknown'),
                 "last_message": state.get('last_message', '')[:50] + '...' if state.get('last_message', '') else '',
-                "has_langgraph_session": user_id in conversation_sessions
+                "has_langgraph_session": user_id in langgraph_session_ids
             }
         
         return {
             "status": "success",
             "total_memory_sessions": len(memory_states),
-            "total_langgraph_sessions": langgraph_sessions,
+            "total_langgraph_sessions": len(langgraph_session_ids),
             "sessions": session_info
         }
     except Exception as e:
-        logger.error(f"Error getting sessions: {str(e)}")
+        logger.error("Error getting sessions: %s", e)
         return {
             "status": "error",
             "error": str(e)
@@ -190,17 +202,16 @@ def clear_user_session(user_id: str):
     try:
         # Clear from memory module
         clear_state(user_id)
-        
-        # Clear from LangGraph sessions
-        if user_id in conversation_sessions:
-            del conversation_sessions[user_id]
+
+        # Clear from the LangGraph checkpointer
+        clear_session(user_id)
         
         return {
             "status": "success",
             "message": f"Session for user {user_id} cleared successfully"
         }
     except Exception as e:
-        logger.error(f"Error clearing session: {str(e)}")
+        logger.error("Error clearing session: %s", e)
         return {
             "status": "error",
             "error": str(e)
@@ -213,21 +224,27 @@ def clear_all_sessions():
         # Clear memory states
         from app.memory import conversation_state
         conversation_state.clear()
-        
-        # Clear LangGraph sessions
-        conversation_sessions.clear()
+
+        # Clear all LangGraph checkpointed sessions
+        clear_sessions()
         
         return {
             "status": "success",
             "message": "All sessions cleared successfully"
         }
     except Exception as e:
-        logger.error(f"Error clearing all sessions: {str(e)}")
+        logger.error("Error clearing all sessions: %s", e)
         return {
             "status": "error",
             "error": str(e)
         }
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # The checkpointer's connection thread would otherwise keep the process
+    # alive after uvicorn stops
+    await close_checkpointer()
+
 # Add middleware for request logging
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -1,14 +1,18 @@
+from collections import defaultdict
 from typing import Dict, Any
 
-# In-memory conversation state
-conversation_state: Dict[str, Dict[str, Any]] = {}
+# In-memory conversation state; defaultdict removes the membership check on
+# every update
+conversation_state: defaultdict = defaultdict(dict)
 
 def update_state(user_id: str, key: str, value: Any) -> None:
     """Update conversation state for a user"""
-    if user_id not in conversation_state:
-        conversation_state[user_id] = {}
     conversation_state[user_id][key] = value
 
+def update_state_bulk(user_id: str, **kv: Any) -> None:
+    """Update several state keys for a user in one dict merge"""
+    conversation_state[user_id].update(kv)
+
 def get_state(user_id: str) -> Dict[str, Any]:
     """Get conversation state for a user"""
     return conversation_state.get(user_id, {})
@@ -1,33 +1,99 @@
 from app.calender_utils import get_free_slots, book_event, list_upcoming_events
 from datetime import datetime, timedelta
+from functools import lru_cache
 import re
 from typing import List, Dict
-from dateutil.parser import parse as parse_datetime
+from cachetools import TTLCache
 import logging
-from datetime import datetime, time
+from datetime import date, datetime, time
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ISO-8601 date / datetime shapes ("2025-06-25", "2025-06-25T15:00:00",
+# "2025-06-25 15:00", optional seconds/fraction/offset). Group 1 is the time
+# part, so callers can tell a bare date from a full datetime.
+_ISO_RE = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$')
+
+# Short-TTL caches in front of the Calendar API: chat sessions re-query the
+# same window constantly, and the API round-trip is the real cost here.
+# Both are cleared after a successful booking so free/busy data never lies.
+_busy_cache = TTLCache(maxsize=128, ttl=30)
+_events_cache = TTLCache(maxsize=128, ttl=30)
+
+# Durations like "1h", "30m", "45min", "1.5" (bare number = hours); 'min'
+# must precede 'm' in the alternation
+_DUR_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(h|min|m|)\s*$', re.IGNORECASE)
+_DUR_MULT = {'h': 1.0, 'min': 1 / 60, 'm': 1 / 60, '': 1.0}
+
+@lru_cache(maxsize=512)
+def _parse_iso(s: str, had_time: bool):
+    """Parse an ISO-shaped string via fromisoformat, memoized.
+
+    ISO strings are self-contained, so these cache entries never go stale.
+    """
+    # A trailing Z can only be the last char, so slicing beats .replace
+    # (which allocates a copy even when there is nothing to replace).
+    # Stripping it keeps the result naive, as downstream expects.
+    if s.endswith('Z'):
+        s = s[:-1]
+    if ' ' in s:
+        s = s.replace(' ', 'T')
+    return datetime.fromisoformat(s), had_time
+
+@lru_cache(maxsize=512)
+def _parse_fallback(s: str, day: date):
+    """dateutil fallback, memoized per (string, current day).
+
+    dateutil fills missing fields from "now", so inputs like "3pm" or
+    "June 30" depend on the wall clock; keying on the day makes cached
+    answers expire naturally at midnight instead of serving yesterday's
+    date for the life of the process.
+    """
+    # Deferred so the common ISO path never pays the dateutil import;
+    # Python caches the module, so later fallbacks are a dict lookup
+    from dateutil.parser import parse as parse_datetime
+    dt = parse_datetime(s)
+    return dt, dt.time() != time(0, 0, 0)
+
+def _parse_iso_or_date(s: str):
+    """Parse a date/datetime string, fast-pathing ISO-8601 via fromisoformat.
+
+    Returns (datetime, had_time). The general-purpose dateutil parser only
+    runs when the string is not ISO-shaped. Chat sessions repeat the same
+    date strings constantly, so both paths are memoized.
+    """
+    m = _ISO_RE.match(s)
+    if m is not None:
+        return _parse_iso(s, m.group(1) is not None)
+    return _parse_fallback(s, date.today())
+
+def _to_bound(s: str, end_of_day: bool):
+    """Parse a range bound; date-only end bounds snap to 23:59:59."""
+    if not s:
+        return None
+    dt, had_time = _parse_iso_or_date(s)
+    if end_of_day and not had_time:
+        dt = dt.replace(hour=23, minute=59, second=59)
+    return dt
+
 def tool_check_availability(start_date: str, end_date: str) -> str:
     """Check available slots between start_date and end_date (full day range assumed)."""
     try:
-        logger.info(f"Checking availability: {start_date} to {end_date}")
+        logger.info("Checking availability: %s to %s", start_date, end_date)
         
-        # Handle different date formats
-        if 'T' in start_date:
-            start = datetime.fromisoformat(start_date.replace('Z', ''))
-        else:
-            start = datetime.fromisoformat(start_date + "T00:00:00")
-            
-        if 'T' in end_date:
-            end = datetime.fromisoformat(end_date.replace('Z', ''))
-        else:
-            end = datetime.fromisoformat(end_date + "T23:59:59")
-
-        busy_slots = get_free_slots(start, end)
+        # Date-only inputs span the full day
+        start = _to_bound(start_date, False)
+        end = _to_bound(end_date, True)
+
+        cache_key = (start.isoformat(), end.isoformat())
+        busy_slots = _busy_cache.get(cache_key)
+        if busy_slots is None:
+            busy_slots = get_free_slots(start, end)
+            if not isinstance(busy_slots, str):  # don't cache error strings
+                _busy_cache[cache_key] = busy_slots
 
         if isinstance(busy_slots, str):
             return busy_slots
@@ -36,45 +102,27 @@ def tool_check_availability(start_date: str, end_date: str) -> str:
             return f"✅ You're fully available between {start_date} and {end_date}."
 
         busy_text = "🗓️ Here are your busy slots:\n" + "\n".join(
-            [f"• {slot['start']} to {slot['end']}" for slot in busy_slots]
+            f"• {slot['start']} to {slot['end']}" for slot in busy_slots
         )
         
         return busy_text
         
     except Exception as e:
-        logger.error(f"Error checking availability: {str(e)}")
+        logger.error("Error checking availability: %s", e)
         return f"Error checking availability: {str(e)}"
 
 def tool_book_slot(start_time: str, duration: str = "1h", title: str = "", description: str = "") -> str:
     """Book a calendar meeting using structured parameters."""
     try:
-        logger.info(f"Booking slot: {start_time} for {duration}")
+        logger.info("Booking slot: %s for %s", start_time, duration)
         
-        # Parse start time - handle different formats
-        if 'T' in start_time:
-            start = datetime.fromisoformat(start_time.replace('Z', ''))
-        else:
-            # Try to parse as "YYYY-MM-DD HH:MM" format
-            try:
-                start = datetime.strptime(start_time, "%Y-%m-%d %H:%M")
-            except ValueError:
-                # Fallback to dateutil parser
-                start = parse_datetime(start_time)
-
-        # Parse duration
-        hours = 1
-        if duration.lower().endswith("h"):
-            hours = float(duration[:-1])
-        elif duration.lower().endswith("m"):
-            hours = float(duration[:-1]) / 60
-        elif duration.lower().endswith("min"):
-            hours = float(duration[:-3]) / 60
-        else:
-            # Try to parse as just a number (assume hours)
-            try:
-                hours = float(duration)
-            except ValueError:
-                hours = 1
+        # Parse start time - "YYYY-MM-DD HH:MM" and ISO forms take the fast
+        # path, anything else falls back to dateutil inside the helper
+        start, _ = _parse_iso_or_date(start_time)
+
+        # Parse duration: one regex match + unit lookup, default 1 hour
+        m = _DUR_RE.match(duration)
+        hours = float(m.group(1)) * _DUR_MULT[m.group(2).lower()] if m else 1
 
         end = start + timedelta(hours=hours)
 
@@ -84,40 +132,33 @@ def tool_book_slot(start_time: str, duration: str = "1h", title: str = "", descr
 
         # Book the event
         result = book_event(title, start, end, description)
+
+        # A new event invalidates any cached free/busy and event-list data
+        if result.startswith("✅"):
+            _busy_cache.clear()
+            _events_cache.clear()
+
         return result
 
     except Exception as e:
-        logger.error(f"Error booking slot: {str(e)}")
+        logger.error("Error booking slot: %s", e)
         return f"Error booking slot: {str(e)}"
 
 def tool_list_events(start_date: str = None, end_date: str = None) -> list:
     """List upcoming events, optionally filtered by date range, returning structured data."""
     try:
-        logger.info(f"Listing events: {start_date} to {end_date}")
+        logger.info("Listing events: %s to %s", start_date, end_date)
         
-        start = None
-        end = None
-
-        if start_date:
-            if 'T' in start_date:
-                start = datetime.fromisoformat(start_date.replace('Z', ''))
-            else:
-                dt = parse_datetime(start_date)
-                if dt.time() == time(0, 0, 0):
-                    dt = dt.replace(hour=0, minute=0, second=0)
-                start = dt
-
-        if end_date:
-            if 'T' in end_date:
-                end = datetime.fromisoformat(end_date.replace('Z', ''))
-            else:
-                dt = parse_datetime(end_date)
-                if dt.time() == time(0, 0, 0):
-                    dt = dt.replace(hour=23, minute=59, second=59)
-                end = dt
-
-        events = list_upcoming_events(start=start, end=end)
-        print(events)
+        start = _to_bound(start_date, False)
+        end = _to_bound(end_date, True)
+
+        cache_key = (start and start.isoformat(), end and end.isoformat())
+        events = _events_cache.get(cache_key)
+        if events is None:
+            events = list_upcoming_events(start=start, end=end)
+            if not isinstance(events, str):  # don't cache error strings
+                _events_cache[cache_key] = events
+        logger.debug("events=%s", events)
         if isinstance(events, str):
             return [{
                 "summary": "Error",
@@ -187,7 +228,7 @@ def tool_list_events(start_date: str = None, end_date: str = None) -> list:
         return events
 
     except Exception as e:
-        logger.error(f"Error listing events: {str(e)}")
+        logger.error("Error listing events: %s", e)
         return [{
             "summary": "Error",
             "date": "",
@@ -197,48 +238,59 @@ def tool_list_events(start_date: str = None, end_date: str = None) -> list:
         }]
 
 
+# One alternation regex instead of a cascade of substring checks; named
+# groups tell us which expression matched in a single C-level scan.
+_NAT_RE = re.compile(
+    r'\b(?:(?P<simple>today|now|tomorrow|yesterday)'
+    r'|(?:(?P<next_>next)\s+)?'
+    r'(?:(?P<wday>monday|tuesday|wednesday|thursday|friday|saturday|sunday)|(?P<week>week)))\b',
+    re.IGNORECASE
+)
+
+_SIMPLE_OFFSETS = {'today': 0, 'now': 0, 'tomorrow': 1, 'yesterday': -1}
+
+_WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+
+def _days_ahead(day_num: int, today_wday: int, is_next: bool) -> int:
+    """Days until the requested weekday (always in the future; 'next' adds a week)."""
+    d = day_num - today_wday
+    if d <= 0:  # Target day already happened this week
+        d += 7
+    if is_next:
+        d += 7
+    return d
+
 # Helper function to parse natural language time expressions
 def parse_natural_time(time_expr: str, reference_time: datetime = None) -> datetime:
     """Parse natural language time expressions like 'tomorrow', 'next Monday', etc."""
     if reference_time is None:
         reference_time = datetime.now()
-    
-    time_expr = time_expr.lower().strip()
-    
-    # Today
-    if time_expr in ['today', 'now']:
-        return reference_time.replace(hour=9, minute=0, second=0, microsecond=0)
-    
-    # Tomorrow
-    if time_expr == 'tomorrow':
-        return (reference_time + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
-    
-    # Yesterday
-    if time_expr == 'yesterday':
-        return (reference_time - timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
-    
-    # This week, next week patterns
-    if 'week' in time_expr:
-        days_ahead = 7 if 'next' in time_expr else 0
-        return (reference_time + timedelta(days=days_ahead)).replace(hour=9, minute=0, second=0, microsecond=0)
-    
-    # Weekday names
-    weekdays = {
-        'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-        'friday': 4, 'saturday': 5, 'sunday': 6
-    }
-    
-    for day_name, day_num in weekdays.items():
-        if day_name in time_expr:
-            days_ahead = day_num - reference_time.weekday()
-            if days_ahead <= 0:  # Target day already happened this week
-                days_ahead += 7
-            if 'next' in time_expr:
-                days_ahead += 7
-            return (reference_time + timedelta(days=days_ahead)).replace(hour=9, minute=0, second=0, microsecond=0)
-    
+
+    m = _NAT_RE.search(time_expr.strip())
+    if m is not None:
+        base = reference_time.replace(hour=9, minute=0, second=0, microsecond=0)
+
+        if m.group('simple'):
+            return base + timedelta(days=_SIMPLE_OFFSETS[m.group('simple').lower()])
+
+        # This week / next week
+        if m.group('week'):
+            return base + timedelta(days=7 if m.group('next_') else 0)
+
+        # Weekday names
+        days = _days_ahead(
+            _WEEKDAYS[m.group('wday').lower()],
+            reference_time.weekday(),
+            bool(m.group('next_'))
+        )
+        return base + timedelta(days=days)
+
     # If nothing matches, try dateutil parser
     try:
+        from dateutil.parser import parse as parse_datetime
         return parse_datetime(time_expr)
     except:
         return reference_time
\ No newline at end of file